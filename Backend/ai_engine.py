@@ -1,25 +1,47 @@
 
 from ultralytics import YOLO
+from ultralytics.utils import ops
 import torch
-import cv2
+import torch.nn.functional as F
 import numpy as np
 from pathlib import Path
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import asyncio
+from image_utils import letterbox, letterbox_params, unletterbox_boxes
+from model_export import EXPORT_IMGSZ, export_model
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Use TF32 Tensor Cores for FP32 matmuls/convs and let cuDNN autotune
+# conv algorithms (inputs are a fixed 640x640 letterbox, so the choice is cached)
+torch.set_float32_matmul_precision('high')
+torch.backends.cudnn.benchmark = True
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+
+# Per-frame (xyxy, confidences, class ids) when a model returns no boxes
+_EMPTY_DETECTIONS = (np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=int))
+
 
 class AIEngine:
     """Multi-model AI detection engine for Guard-X surveillance"""
     
     def __init__(self):
         self.models: Dict[str, YOLO] = {}
+        self._person_class_ids: Dict[str, np.ndarray] = {}  # model_type -> class ids mapped to Human
+        self.model_backends: Dict[str, str] = {}  # model_type -> 'torch' | 'engine'
         self.model_loaded = False
         self.confidence_threshold = 0.25  # Lowered from 0.4 for better sensitivity
+        self.iou_threshold = 0.45
+        
+        # Fallback model only runs when the custom model found no confident Human
+        self.fallback_skip_confidence = 0.5
+        self.fallback_check_interval = 10  # frames per camera between forced fallback passes
+        self._fallback_counters: Dict[str, int] = {}
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        # FP16 weights and inputs on CUDA (halves memory traffic, uses Tensor Cores)
+        self._dtype = torch.float16 if self.device == 'cuda' else torch.float32
         
         # Base path for models
         base_path = Path(__file__).parent
@@ -30,12 +52,73 @@ class AIEngine:
             'fallback': 'yolov8n.pt'
         }
         
+        # Input size of the TensorRT engines (see model_export) and the CUDA Graph buffers
+        self.engine_imgsz = EXPORT_IMGSZ
+        
+        # CUDA Graph state per model and batch size (fixed 640x640 letterboxed input)
+        self.graph_batch_sizes = (1, 2, 4, 8)
+        self._cuda_graphs: Dict[str, Dict[int, 'torch.cuda.CUDAGraph']] = {}
+        self._static_inputs: Dict[str, Dict[int, torch.Tensor]] = {}
+        self._static_outputs: Dict[str, Dict[int, torch.Tensor]] = {}
+        self._graph_pool = None  # memory pool handle shared by all captures
+        
+        # Micro-batching of frames across cameras
+        self.max_batch = 8
+        self.batch_window = 0.008  # seconds to wait for more frames to join a batch
+        self._batch_queue: asyncio.Queue = asyncio.Queue()
+        self._batch_task: Optional[asyncio.Task] = None
+        
         # Class name mapping
         self.class_names = {
             'person': 'Human',
             'human': 'Human'
         }
     
+    def _capture_cuda_graph(self, model_type: str, model: YOLO):
+        """
+        Capture the forward pass of a model into CUDA Graphs with static
+        Bx3x640x640 input buffers (one per batch size bucket), so each batch
+        is a copy + replay instead of dozens of individual kernel launches.
+        """
+        if self.device != 'cuda':
+            return
+        
+        module = model.model.eval()
+        graphs, static_inputs, static_outputs = {}, {}, {}
+        side_stream = torch.cuda.Stream()
+        # Buckets are captured largest first into one memory pool shared by every model,
+        # so smaller buckets reuse the batch-8 activations instead of each holding a private
+        # pool. Safe because graphs are replayed one at a time and each output is read
+        # before the next replay
+        try:
+            for batch_size in sorted(self.graph_batch_sizes, reverse=True):
+                static_in = torch.zeros(batch_size, 3, self.engine_imgsz, self.engine_imgsz, device=self.device, dtype=self._dtype)
+                
+                # Warm up on a side stream before capture
+                side_stream.wait_stream(torch.cuda.current_stream())
+                with torch.no_grad(), torch.cuda.stream(side_stream):
+                    for _ in range(3):
+                        module(static_in)
+                torch.cuda.current_stream().wait_stream(side_stream)
+                
+                graph = torch.cuda.CUDAGraph()
+                with torch.no_grad(), torch.cuda.graph(graph, pool=self._graph_pool):
+                    static_out = module(static_in)
+                if self._graph_pool is None:
+                    self._graph_pool = graph.pool()
+                
+                graphs[batch_size] = graph
+                static_inputs[batch_size] = static_in
+                static_outputs[batch_size] = static_out[0] if isinstance(static_out, (list, tuple)) else static_out
+        except Exception as e:
+            logger.warning(f"⚠️ CUDA Graph capture failed for {model_type}: {e}")
+            return
+        
+        self._cuda_graphs[model_type] = graphs
+        self._static_inputs[model_type] = static_inputs
+        self._static_outputs[model_type] = static_outputs
+        logger.info(f"⚡ Captured CUDA Graphs for {model_type} model (batch sizes {list(graphs)})")
+    
     async def load_models(self):
         """
         Load all available YOLO models
@@ -55,10 +138,34 @@ class AIEngine:
 
             if path.exists() or model_type == 'fallback':
                 try:
-                    logger.info(f"🔍 Loading {model_type} model from: {path if path.exists() else model_path}")
-                    model = YOLO(str(path) if path.exists() else model_path)
-                    model.to(self.device)
+                    weights = path if path.exists() else Path(model_path)
+                    # TensorRT engine on CUDA; CPU hosts run the PyTorch weights
+                    engine_path = export_model(weights, 'engine') if self.device == 'cuda' else None
+                    
+                    if engine_path is not None:
+                        logger.info(f"🔍 Loading {model_type} TensorRT engine from: {engine_path}")
+                        model = YOLO(str(engine_path), task='detect')
+                        self.model_backends[model_type] = 'engine'
+                    else:
+                        logger.info(f"🔍 Loading {model_type} model from: {weights}")
+                        model = YOLO(str(weights))
+                        model.to(self.device)
+                        # Graph replay bypasses the predictor (which would fuse on setup),
+                        # so fold BN into the convs before the graphs are captured
+                        try:
+                            model.fuse()
+                        except Exception as e:
+                            logger.warning(f"⚠️ Layer fusion skipped for {model_type}: {e}")
+                        if self._dtype == torch.float16:
+                            model.model.half()
+                        self._capture_cuda_graph(model_type, model)
+                        self.model_backends[model_type] = 'torch'
+                    
                     self.models[model_type] = model
+                    self._person_class_ids[model_type] = np.array(
+                        [cls for cls, name in model.names.items() if self.class_names.get(name.lower()) == 'Human'],
+                        dtype=int
+                    )
                     logger.info(f"✅ Loaded {model_type} model")
                     models_loaded += 1
                 except Exception as e:
@@ -68,84 +175,224 @@ class AIEngine:
         logger.info(f"🎯 AI Engine ready with {models_loaded} model(s): {list(self.models.keys())}")
         return self.model_loaded
     
+    def _predict(self, model: YOLO, frames: List[np.ndarray], classes: Optional[List[int]]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Run the Ultralytics predictor on a batch of frames
+        Returns per-frame (xyxy, confidences, class ids) arrays in original frame coordinates
+        """
+        # Letterbox to a fixed 640x640 uint8 frame so the predictor's color
+        # conversion and normalization only touch the downscaled pixels
+        letterboxed = [letterbox(frame, self.engine_imgsz) for frame in frames]
+        detection_frames = [img for img, _, _ in letterboxed]
+        
+        # half must match the weights, otherwise the predictor casts the model back to FP32
+        results = model(
+            detection_frames,
+            conf=self.confidence_threshold,
+            classes=classes,
+            half=self._dtype == torch.float16,
+            verbose=False
+        )
+        
+        batch_dets = []
+        for result, frame, (_, ratio, (pad_x, pad_y)) in zip(results, frames, letterboxed):
+            boxes = result.boxes
+            if boxes is None:
+                batch_dets.append(_EMPTY_DETECTIONS)
+                continue
+            
+            # One device->host transfer per tensor instead of three per box
+            xyxy = boxes.xyxy.cpu().numpy()
+            confs = boxes.conf.cpu().numpy()
+            clss = boxes.cls.cpu().numpy().astype(int)
+            
+            unletterbox_boxes(xyxy, ratio, (pad_x, pad_y), frame.shape[:2])
+            
+            batch_dets.append((xyxy, confs, clss))
+        
+        return batch_dets
+    
+    def _preprocess_gpu(self, frame: np.ndarray, out: torch.Tensor) -> Tuple[float, Tuple[int, int]]:
+        """
+        Letterbox a BGR uint8 frame straight into a 3x640x640 device tensor
+        Upload, BGR->RGB, HWC->CHW, resize, pad and normalize all run on the GPU,
+        so the frame crosses the bus once as uint8 and never touches the CPU again
+        
+        Returns:
+            (unified scale ratio, (pad_x, pad_y))
+        """
+        height, width = frame.shape[:2]
+        ratio, (new_width, new_height), (pad_x, pad_y) = letterbox_params(height, width, self.engine_imgsz)
+        
+        src = torch.from_numpy(frame).to(self.device, non_blocking=True)
+        src = src.permute(2, 0, 1).flip(0).unsqueeze(0).to(self._dtype)
+        if (new_height, new_width) != (height, width):
+            src = F.interpolate(src, size=(new_height, new_width), mode='bilinear', align_corners=False)
+        
+        out.fill_(114.0 / 255.0)
+        out[:, pad_y:pad_y + new_height, pad_x:pad_x + new_width].copy_(src[0].div_(255.0))
+        return ratio, (pad_x, pad_y)
+    
+    def _graph_inference(self, model_type: str, frames: List[np.ndarray], classes: Optional[List[int]]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Run a batch of frames through the captured CUDA Graphs of a model
+        Returns per-frame (xyxy, confidences, class ids) arrays in original frame coordinates
+        """
+        graphs = self._cuda_graphs[model_type]
+        max_bucket = max(graphs)
+        
+        batch_dets = []
+        for start in range(0, len(frames), max_bucket):
+            chunk = frames[start:start + max_bucket]
+            n = len(chunk)
+            
+            # Smallest captured batch size that fits the chunk (rest of the buffer is ignored)
+            bucket = min(b for b in graphs if b >= n)
+            static_in = self._static_inputs[model_type][bucket]
+            letterboxed = [self._preprocess_gpu(frame, static_in[i]) for i, frame in enumerate(chunk)]
+            
+            graphs[bucket].replay()
+            
+            dets = ops.non_max_suppression(
+                # Keep NMS in FP32
+                self._static_outputs[model_type][bucket][:n].float(),
+                self.confidence_threshold,
+                self.iou_threshold,
+                classes=classes
+            )
+            
+            for det, frame, (ratio, (pad_x, pad_y)) in zip(dets, chunk, letterboxed):
+                det = det.cpu().numpy()
+                
+                unletterbox_boxes(det, ratio, (pad_x, pad_y), frame.shape[:2])
+                
+                batch_dets.append((det[:, :4], det[:, 4], det[:, 5].astype(int)))
+        
+        return batch_dets
+    
+    def _needs_fallback(self, result: dict, camera_id: str) -> bool:
+        """
+        Decide whether the fallback model should run on a frame
+        Skipped when the custom model already found a confident Human, except
+        every fallback_check_interval frames per camera as a sanity check
+        """
+        count = self._fallback_counters.get(camera_id, 0) + 1
+        self._fallback_counters[camera_id] = count
+        if count % self.fallback_check_interval == 0:
+            return True
+        
+        confidences = result['confidences']
+        return not confidences or max(confidences) < self.fallback_skip_confidence
+    
     async def detect(self, frame: np.ndarray, camera_id: str) -> dict:
         """
-        Run detection on frame using loaded models (Multi-model Human Detection)
-        Optimized for 50 FPS with redundant custom + fallback strategy
+        Run detection on a single frame using loaded models
         """
-        if not self.model_loaded:
-            return {
+        results = await self.detect_batch([frame], [camera_id])
+        return results[0]
+    
+    async def detect_batch(self, frames: List[np.ndarray], camera_ids: List[str]) -> List[dict]:
+        """
+        Run detection on a batch of frames using loaded models (Multi-model Human Detection)
+        Optimized for 50 FPS: custom model first, fallback only where it found nothing confident
+        """
+        results = [
+            {
                 'camera_id': camera_id,
                 'boxes': [],
                 'labels': [],
                 'confidences': [],
                 'count': 0
             }
+            for camera_id in camera_ids
+        ]
         
-        # Resize frame for performance (640x480 max)
-        height, width = frame.shape[:2]
-        scale = 1.0
-        if width > 640:
-            scale = 640 / width
-            new_width = 640
-            new_height = int(height * scale)
-            detection_frame = cv2.resize(frame, (new_width, new_height))
-        else:
-            detection_frame = frame
-        
-        all_boxes = []
-        all_labels = []
-        all_confidences = []
-        
-        # Run inference on each model
+        if not self.model_loaded:
+            return results
+        
+        # Run inference on each model (custom first, see model_paths order)
         for model_type, model in self.models.items():
+            indices = list(range(len(frames)))
+            if model_type == 'fallback':
+                # Skip the fallback pass for frames the custom model already covered
+                indices = [i for i in indices if self._needs_fallback(results[i], camera_ids[i])]
+                if not indices:
+                    continue
+            
             try:
                 # Optimized: For fallback YOLO, only detect persons (class 0)
-                if model_type == 'fallback':
-                    results = model(detection_frame, conf=self.confidence_threshold, classes=[0], verbose=False)
+                classes = [0] if model_type == 'fallback' else None
+                batch_frames = [frames[i] for i in indices]
+                
+                if model_type in self._cuda_graphs:
+                    batch_dets = self._graph_inference(model_type, batch_frames, classes)
                 else:
-                    results = model(detection_frame, conf=self.confidence_threshold, verbose=False)
+                    batch_dets = self._predict(model, batch_frames, classes)
                 
-                for result in results:
-                    boxes = result.boxes
-                    if boxes is None: continue
+                person_ids = self._person_class_ids[model_type]
+                for i, (xyxy, confs, clss) in zip(indices, batch_dets):
+                    # Filter for Human only in one shot
+                    mask = np.isin(clss, person_ids)
+                    if not mask.any():
+                        continue
                     
-                    for box in boxes:
-                        # Extract box coordinates
-                        coords = box.xyxy[0].cpu().numpy()
-                        x1, y1, x2, y2 = coords
-                        
-                        # Scale back to original size
-                        if scale != 1.0:
-                            x1, y1, x2, y2 = x1 / scale, y1 / scale, x2 / scale, y2 / scale
-                        
-                        conf = float(box.conf[0].cpu().numpy())
-                        cls = int(box.cls[0].cpu().numpy())
-                        
-                        # Get class name
-                        class_name = result.names[cls] if hasattr(result, 'names') else 'Unknown'
-                        
-                        # Map to our class names and filter for Human only
-                        label = self.class_names.get(class_name.lower())
-                        if label != 'Human' and class_name.lower() not in ['person', 'human']:
-                            continue
-                        
-                        # Final label is always 'Human' as per user request
-                        label = 'Human'
-                        
-                        # Add detection
-                        all_boxes.append([int(x1), int(y1), int(x2), int(y2)])
-                        all_labels.append(label)
-                        all_confidences.append(conf)
+                    boxes = xyxy[mask].astype(np.int32).tolist()
+                    
+                    # Final label is always 'Human' as per user request
+                    result = results[i]
+                    result['boxes'].extend(boxes)
+                    result['labels'].extend(['Human'] * len(boxes))
+                    result['confidences'].extend(confs[mask].tolist())
                         
             except Exception as e:
                 logger.error(f"❌ Detection error with {model_type}: {e}")
         
-        return {
-            'camera_id': camera_id,
-            'boxes': all_boxes,
-            'labels': all_labels,
-            'confidences': all_confidences,
-            'count': len(all_boxes)
-        }
-
+        for result in results:
+            result['count'] = len(result['boxes'])
+        
+        return results
+    
+    async def submit(self, frame: np.ndarray, camera_id: str) -> dict:
+        """
+        Queue a frame for batched detection and wait for its result
+        Frames arriving from different cameras within batch_window are
+        coalesced into a single forward pass
+        """
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_task = asyncio.create_task(self._batch_worker())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._batch_queue.put((frame, camera_id, future))
+        return await future
+    
+    async def _batch_worker(self):
+        """Drain queued frames into batches of up to max_batch and resolve their futures"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await self._batch_queue.get()]
+            deadline = loop.time() + self.batch_window
+            
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._batch_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            frames = [frame for frame, _, _ in batch]
+            camera_ids = [camera_id for _, camera_id, _ in batch]
+            futures = [future for _, _, future in batch]
+            
+            try:
+                results = await self.detect_batch(frames, camera_ids)
+                for future, result in zip(futures, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                logger.error(f"❌ Batch detection error: {e}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
@@ -1,23 +1,28 @@
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
 from jose import JWTError, jwt
+from cachetools import TTLCache
 from datetime import datetime, timedelta
+import hmac
 import os
+import time
 from pydantic import BaseModel
 from typing import Optional
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT settings
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this")
 ALGORITHM = "HS256"
+# Pre-encoded key and algorithm allow-list, reused by every encode/decode
+SECRET_KEY_BYTES = SECRET_KEY.encode("utf-8")
+ALGORITHMS = (ALGORITHM,)
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
 # Security scheme
 security = HTTPBearer()
 
+# Verified token -> decoded payload, so repeat requests and socket reconnects skip jwt.decode
+_token_cache = TTLCache(maxsize=1024, ttl=60)
+
 # ARMY CREDENTIALS (CLASSIFIED)
 ARMY_USERS = {
     "admin": {
@@ -85,6 +90,12 @@ ARMY_USERS = {
     }
 }
 
+# Username -> (user_type, user_data) index for O(1) lookups per request
+_USERS_BY_USERNAME = {
+    user_data["username"]: (user_type, user_data)
+    for user_type, user_data in ARMY_USERS.items()
+}
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -97,8 +108,8 @@ class Token(BaseModel):
     unit: str
 
 def verify_password(plain_password, stored_password):
-    """Verify password against stored password"""
-    return plain_password == stored_password
+    """Verify password against stored password (constant-time compare)"""
+    return hmac.compare_digest(plain_password.encode("utf-8"), stored_password.encode("utf-8"))
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT token"""
@@ -108,25 +119,46 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY_BYTES, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_token(token: str) -> dict:
+    """
+    Decode and verify a JWT, reusing the cached payload of a token verified before
+    Shared by HTTP auth and the Socket.IO connect handler; callers must not mutate the result
+    
+    Raises:
+        JWTError: if the token is invalid or expired
+    """
+    payload = _token_cache.get(token)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            return payload
+        _token_cache.pop(token, None)
+    
+    payload = jwt.decode(token, SECRET_KEY_BYTES, algorithms=ALGORITHMS)
+    if payload.get("exp") is not None:
+        _token_cache[token] = payload
+    return payload
+
 def authenticate_army_user(username: str, password: str):
     """Authenticate against army credentials"""
-    # Check admin credentials
-    for user_type, user_data in ARMY_USERS.items():
-        if user_data["username"] == username:
-            if verify_password(password, user_data["password"]):
-                return {
-                    "username": user_data["username"],
-                    "email": user_data["email"],
-                    "full_name": user_data["full_name"],
-                    "role": user_data["role"],
-                    "clearance_level": user_data["clearance_level"],
-                    "unit": user_data["unit"],
-                    "login_time": datetime.utcnow(),
-                    "user_type": user_type
-                }
+    entry = _USERS_BY_USERNAME.get(username)
+    if entry is None:
+        return False
+    
+    user_type, user_data = entry
+    if verify_password(password, user_data["password"]):
+        return {
+            "username": user_data["username"],
+            "email": user_data["email"],
+            "full_name": user_data["full_name"],
+            "role": user_data["role"],
+            "clearance_level": user_data["clearance_level"],
+            "unit": user_data["unit"],
+            "login_time": datetime.utcnow(),
+            "user_type": user_type
+        }
     return False
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -138,7 +170,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     )
     
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(credentials.credentials)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -146,21 +178,23 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise credentials_exception
     
     # Verify user still exists in army system
-    user_found = False
-    for user_data in ARMY_USERS.values():
-        if user_data["username"] == username:
-            user_found = True
-            return {
-                "username": user_data["username"],
-                "email": user_data["email"],
-                "full_name": user_data["full_name"],
-                "role": user_data["role"],
-                "clearance_level": user_data["clearance_level"],
-                "unit": user_data["unit"]
-            }
-    
-    if not user_found:
+    entry = _USERS_BY_USERNAME.get(username)
+    if entry is None:
         raise credentials_exception
+    
+    _, user_data = entry
+    return {
+        "username": user_data["username"],
+        "email": user_data["email"],
+        "full_name": user_data["full_name"],
+        "role": user_data["role"],
+        "clearance_level": user_data["clearance_level"],
+        "unit": user_data["unit"]
+    }
+
+def invalidate_token_cache():
+    """Drop cached token verifications for HTTP and Socket.IO (call after any change to ARMY_USERS)"""
+    _token_cache.clear()
 
 def require_admin_access(current_user = Depends(get_current_user)):
     """Require admin level access"""
@@ -197,6 +231,8 @@ def require_clearance_level(required_level: str):
 # Initialize system on startup
 def initialize_army_auth_system():
     """Initialize army authentication system"""
+    invalidate_token_cache()
+    
     print("🔒 INITIALIZING ARMY AUTHENTICATION SYSTEM")
     print("=" * 50)
     print("🎖️  CLASSIFIED MILITARY SYSTEM")
@@ -2,11 +2,14 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from fastapi.responses import StreamingResponse
 import cv2
 import asyncio
+import threading
 import json
+import orjson
 import base64
 import numpy as np
 from auth import get_current_user
 from model_wrapper import ModelWrapper
+from camera_stream import encode_frame, MotionGate
 
 router = APIRouter()
 
@@ -17,6 +20,13 @@ class CameraManager:
         self.camera = None
         self.is_streaming = False
         self.gps_location = None
+        self.motion_gate = MotionGate()
+        
+        # Single-slot latest-frame buffer filled by the capture thread
+        self._latest_frame = None
+        self._frame_lock = threading.Lock()
+        self._frame_ready = threading.Event()
+        self._capture_thread = None
         
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
@@ -28,20 +38,33 @@ class CameraManager:
             self.active_connections.remove(websocket)
             print(f" WebSocket disconnected. Total connections: {len(self.active_connections)}")
             
+    @staticmethod
+    def _open_camera(camera_id):
+        """Open and configure a capture device (blocking, run off the event loop)"""
+        camera = cv2.VideoCapture(camera_id)
+        if camera.isOpened():
+            camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            camera.set(cv2.CAP_PROP_FPS, 30)
+        return camera
+    
     async def start_camera(self, camera_id=0):
         """Start camera capture"""
         try:
             print(f" Starting camera {camera_id}...")
-            self.camera = cv2.VideoCapture(camera_id)
+            self.camera = await asyncio.to_thread(self._open_camera, camera_id)
             
             if not self.camera.isOpened():
                 print("Camera failed to open")
                 return False
                 
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.camera.set(cv2.CAP_PROP_FPS, 30)
             self.is_streaming = True
+            
+            # Capture runs on its own thread so slow clients never throttle it
+            self._latest_frame = None
+            self._frame_ready.clear()
+            self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self._capture_thread.start()
             print("Camera started successfully")
             return True
         except Exception as e:
@@ -52,28 +75,70 @@ class CameraManager:
         """Stop camera capture"""
         print("Stopping camera...")
         self.is_streaming = False
+        if self._capture_thread:
+            await asyncio.to_thread(self._capture_thread.join, 1.0)
+            self._capture_thread = None
         if self.camera:
-            self.camera.release()
-            self.camera = None
+            camera, self.camera = self.camera, None
+            await asyncio.to_thread(camera.release)
         print(" Camera stopped")
             
+    def _capture_loop(self):
+        """Read frames continuously, keeping only the latest one (stale frames are dropped)"""
+        while self.is_streaming and self.camera:
+            ret, frame = self.camera.read()
+            if not ret:
+                print("❌ Failed to read frame")
+                break
+            with self._frame_lock:
+                self._latest_frame = frame
+                self._frame_ready.set()
+        self._frame_ready.set()  # wake the stream so it notices capture ended
+        print(" Capture loop ended")
+    
+    def _take_latest_frame(self):
+        """Take the latest captured frame, leaving the slot empty"""
+        with self._frame_lock:
+            frame = self._latest_frame
+            self._latest_frame = None
+            self._frame_ready.clear()
+        return frame
+    
+    async def _broadcast(self, message):
+        """Send a message to all clients concurrently, dropping the ones that fail"""
+        connections = list(self.active_connections)
+        if not connections:
+            return
+        
+        # Serialize once for every client
+        payload = orjson.dumps(message)
+        results = await asyncio.gather(
+            *[connection.send_bytes(payload) for connection in connections],
+            return_exceptions=True
+        )
+        
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                print(f"❌ Failed to send to client: {result}")
+                self.disconnect(connection)
+    
     async def stream_detection(self):
         """Stream camera with real-time detection"""
         print(" Starting detection stream...")
-        frame_count = 0
         last_detection_result = {"boxes": [], "count": 0, "confidences": []}
         
         while self.is_streaming and self.camera:
             try:
-                ret, frame = self.camera.read()
-                if not ret:
-                    print("❌ Failed to read frame")
-                    break
-                
-                frame_count += 1
-                
+                # Block a worker thread (not the event loop) until a new frame lands
+                await asyncio.to_thread(self._frame_ready.wait, 0.1)
+                frame = self._take_latest_frame()
+                if frame is None:
+                    if self._capture_thread is None or not self._capture_thread.is_alive():
+                        break
+                    continue
                 
-                if frame_count % 5 == 0:
+                # Only run the model when the scene changed (or cached boxes are stale)
+                if self.motion_gate.should_detect("local", frame):
                     detection_result = await self.model_wrapper.detect_realtime_frame(frame)
                     last_detection_result = detection_result
                 else:
@@ -83,8 +148,11 @@ class CameraManager:
                 annotated_frame = self.draw_detections(frame, detection_result)
                 
                 
-                _, buffer = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 35])
-                frame_base64 = base64.b64encode(buffer).decode('utf-8')
+                # GPU (nvJPEG) encode when available, CPU otherwise
+                jpeg = encode_frame(annotated_frame, quality=35)
+                if jpeg is None:
+                    continue
+                frame_base64 = base64.b64encode(jpeg).decode('utf-8')
                 
                 
                 message = {
@@ -95,20 +163,7 @@ class CameraManager:
                     "gps_location": self.gps_location
                 }
                 
-                
-                disconnected = []
-                for connection in self.active_connections:
-                    try:
-                        await connection.send_text(json.dumps(message))
-                    except Exception as e:
-                        print(f"❌ Failed to send to client: {e}")
-                        disconnected.append(connection)
-                
-                
-                for conn in disconnected:
-                    self.disconnect(conn)
-                    
-                await asyncio.sleep(0.02)  # ~50 FPS for extreme smoothness
+                await self._broadcast(message)
                 
             except Exception as e:
                 print(f"Streaming error: {e}")
@@ -117,8 +172,8 @@ class CameraManager:
         print(" Detection stream ended")
                 
     def draw_detections(self, frame, detection_result):
-        """Draw bounding boxes on frame"""
-        annotated_frame = frame.copy()
+        """Draw bounding boxes on frame (in place, the captured frame is not reused)"""
+        annotated_frame = frame
         
         for i, box in enumerate(detection_result["boxes"]):
             x1, y1, x2, y2 = map(int, box)
@@ -130,6 +185,7 @@ class CameraManager:
             
            
             label = f"{label_name.upper()} {i+1}: {confidence:.2f}"
+            # Not cached: box index x confidence rarely repeats (see camera_stream.get_text_size)
             label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
             cv2.rectangle(annotated_frame, (x1, y1-25), (x1+label_size[0], y1), (0, 0, 255), -1)
             cv2.putText(annotated_frame, label, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
@@ -6,7 +6,7 @@ Data flow:
 Socket.IO Frame → Decode JPEG → Numpy Array → AI Engine → Detection Result
 
 Responsibilities:
-- Receive base64-encoded JPEG frames from Socket.IO
+- Receive raw JPEG frames (binary Socket.IO payloads) from Socket.IO
 - Decode frames to OpenCV format (numpy arrays)
 - Forward frames to AI engine for detection
 - Handle both USB camera and remote laptop sources identically
@@ -14,30 +14,134 @@ Responsibilities:
 - Optimize frame processing for 8-10 FPS target
 
 Frame Format:
-- Input: base64-encoded JPEG string
+- Input: raw JPEG bytes (binary Socket.IO payloads, no base64)
 - Processing: OpenCV numpy array (BGR)
-- Output: Detection dict with boxes, labels, confidences
+- Output: Detection dict with boxes, labels, confidences and raw JPEG bytes
 """
 
 import cv2
 import numpy as np
-import base64
 import logging
-from typing import Optional
+import os
+import queue
+import time
+import torch
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Union
 from ai_engine import AIEngine
+from image_utils import fit_width_params
 import asyncio
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# TurboJPEG decodes/encodes straight to/from BGR without OpenCV's extra copies
+# Falls back to cv2 when PyTurboJPEG or the libturbojpeg shared library is missing
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    _turbojpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError) as e:
+    _turbojpeg = None
+    logger.info(f"ℹ️ TurboJPEG unavailable, using OpenCV for JPEG: {e}")
+
+# nvJPEG encode on the GPU (torchvision >= 0.19); disabled after the first failure
+# Opt-in with GUARDX_GPU_JPEG=1: frames are annotated on the CPU, so this costs a
+# full-frame upload and a blocking device sync per frame to save the CPU encode
+_gpu_jpeg_enabled = torch.cuda.is_available() and os.getenv('GUARDX_GPU_JPEG', '0') == '1'
+
 # Global AI engine instance
 ai_engine = None
 
 # Frame caching for ultra-high FPS performance
-camera_frame_counts = {}  # camera_id -> count
 camera_detections_cache = {}  # camera_id -> last_detections
 
 
+class MotionGate:
+    """
+    Decides per camera whether a frame needs fresh AI detection
+    
+    Frames are reduced to a small grayscale thumbnail and compared with the
+    previous one. Static scenes reuse cached detections until they are
+    max_age seconds old; any meaningful change triggers inference.
+    """
+    
+    def __init__(self, threshold: float = 4.0, max_age: float = 1.0, size: int = 64):
+        self.threshold = threshold  # mean absolute pixel difference (0-255)
+        self.max_age = max_age
+        self.size = size
+        self._prev_small: Dict[str, np.ndarray] = {}
+        self._last_detection: Dict[str, float] = {}
+    
+    def should_detect(self, camera_id: str, frame: np.ndarray) -> bool:
+        """
+        Check whether detection should run on this frame
+        
+        Args:
+            camera_id: Camera identifier
+            frame: OpenCV image (BGR)
+            
+        Returns:
+            True if the scene changed or the cached detections are stale
+        """
+        # Downscale first so the color conversion only touches size x size pixels
+        small = cv2.cvtColor(
+            cv2.resize(frame, (self.size, self.size), interpolation=cv2.INTER_AREA),
+            cv2.COLOR_BGR2GRAY
+        )
+        prev = self._prev_small.get(camera_id)
+        self._prev_small[camera_id] = small
+        
+        now = time.monotonic()
+        if prev is not None and now - self._last_detection.get(camera_id, 0.0) < self.max_age:
+            if cv2.absdiff(prev, small).mean() < self.threshold:
+                return False
+        
+        self._last_detection[camera_id] = now
+        return True
+    
+    def forget(self, camera_id: str):
+        """Drop state for a camera that disconnected"""
+        self._prev_small.pop(camera_id, None)
+        self._last_detection.pop(camera_id, None)
+
+
+motion_gate = MotionGate()
+
+
+class FramePool:
+    """
+    Bounded pool of reusable uint8 frame buffers, keyed by shape
+    
+    Resized frames are written into pooled buffers instead of a fresh
+    allocation per frame. Buffers go back to the pool once the annotated
+    JPEG has been encoded; at most size buffers are kept per shape.
+    """
+    
+    def __init__(self, size: int = 32):
+        self.size = size
+        self._free: Dict[Tuple[int, ...], queue.Queue] = {}
+    
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """Get a buffer of the given shape (allocates one if the pool is empty)"""
+        free = self._free.get(shape)
+        if free is None:
+            free = self._free[shape] = queue.Queue()
+        try:
+            return free.get_nowait()
+        except queue.Empty:
+            return np.empty(shape, np.uint8)
+    
+    def release(self, buf: Optional[np.ndarray]):
+        """Return a buffer to the pool, dropping it if the pool is full"""
+        if buf is None:
+            return
+        free = self._free.get(buf.shape)
+        if free is not None and free.qsize() < self.size:
+            free.put_nowait(buf)
+
+
+frame_pool = FramePool()
+
+
 async def initialize_ai_engine():
     """Initialize the AI engine on startup"""
     global ai_engine
@@ -47,29 +151,25 @@ async def initialize_ai_engine():
         logger.info("✅ Camera stream handler initialized with AI engine")
 
 
-def decode_frame(frame_base64: str) -> Optional[np.ndarray]:
+def decode_frame(frame_data: bytes) -> Optional[np.ndarray]:
     """
-    Decode base64 JPEG frame to OpenCV numpy array
+    Decode JPEG frame to OpenCV numpy array
     
     Args:
-        frame_base64: Base64-encoded JPEG image string
+        frame_data: Raw JPEG bytes
         
     Returns:
         OpenCV image as numpy array (BGR format) or None if decode fails
     """
     try:
-        # Remove data URL prefix if present
-        if ',' in frame_base64:
-            frame_base64 = frame_base64.split(',')[1]
-        
-        # Decode base64 to bytes
-        frame_bytes = base64.b64decode(frame_base64)
-        
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(frame_bytes, np.uint8)
-        
-        # Decode JPEG to OpenCV image
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if _turbojpeg is not None:
+            frame = _turbojpeg.decode(frame_data, pixel_format=TJPF_BGR)
+        else:
+            # Wrap bytes in numpy array (no copy)
+            nparr = np.frombuffer(frame_data, np.uint8)
+            
+            # Decode JPEG to OpenCV image
+            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         if frame is None:
             logger.error("❌ Failed to decode JPEG frame")
@@ -82,55 +182,115 @@ def decode_frame(frame_base64: str) -> Optional[np.ndarray]:
         return None
 
 
-def encode_frame(frame: np.ndarray, quality: int = 60) -> Optional[str]:
+def decode_and_resize(frame_data: bytes, max_width: int = 640) -> Optional[np.ndarray]:
     """
-    Encode OpenCV frame to base64 JPEG
+    Decode a JPEG frame and downscale it to at most max_width pixels wide
+    Runs on the preprocessing pool; cv2 and TurboJPEG release the GIL
+    Downscaled frames live in frame_pool buffers, hand them back with frame_pool.release
+    
+    Args:
+        frame_data: Raw JPEG bytes
+        max_width: Maximum output width, aspect ratio is preserved
+        
+    Returns:
+        OpenCV image as numpy array (BGR format) or None if decode fails
+    """
+    frame = decode_frame(frame_data)
+    if frame is None:
+        return None
+    
+    params = fit_width_params(*frame.shape[:2], max_width)
+    if params is not None:
+        new_width, new_height, _ = params
+        dst = frame_pool.acquire((new_height, new_width, 3))
+        frame = cv2.resize(frame, (new_width, new_height), dst=dst, interpolation=cv2.INTER_AREA)
+    
+    return frame
+
+
+def _encode_frame_gpu(frame: np.ndarray, quality: int) -> Optional[bytes]:
+    """
+    Encode a BGR frame to JPEG with nvJPEG
+    Only the compressed bytes come back to the host
+    """
+    global _gpu_jpeg_enabled
+    try:
+        from torchvision.io import encode_jpeg
+        
+        chw_rgb = torch.from_numpy(frame).to('cuda', non_blocking=True).permute(2, 0, 1).flip(0).contiguous()
+        return encode_jpeg(chw_rgb, quality=quality).cpu().numpy().tobytes()
+    except Exception as e:
+        _gpu_jpeg_enabled = False
+        logger.warning(f"⚠️ GPU JPEG encode unavailable, falling back to CPU: {e}")
+        return None
+
+
+def encode_frame(frame: np.ndarray, quality: int = 60) -> Optional[bytes]:
+    """
+    Encode OpenCV frame to JPEG
     
     Args:
         frame: OpenCV image as numpy array
         quality: JPEG quality (0-100), default 60 for performance
         
     Returns:
-        Base64-encoded JPEG string or None if encode fails
+        Raw JPEG bytes or None if encode fails
     """
     try:
+        if _gpu_jpeg_enabled:
+            jpeg = _encode_frame_gpu(frame, quality)
+            if jpeg is not None:
+                return jpeg
+        
+        if _turbojpeg is not None:
+            return _turbojpeg.encode(frame, quality=quality, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+        
         # Encode frame to JPEG
         encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
-        _, buffer = cv2.imencode('.jpg', frame, encode_param)
-        
-        # Convert to base64
-        frame_base64 = base64.b64encode(buffer).decode('utf-8')
+        ok, buffer = cv2.imencode('.jpg', frame, encode_param)
+        if not ok:
+            return None
         
-        return frame_base64
+        return buffer.tobytes()
         
     except Exception as e:
         logger.error(f"❌ Frame encode error: {e}")
         return None
 
 
+# Color mapping for different threat types
+COLOR_MAP = {
+    'Human': (0, 255, 255),    # Yellow
+    'Weapon': (0, 0, 255),      # Red
+    'Vehicle': (255, 0, 0),     # Blue
+}
+
+
+@lru_cache(maxsize=128)
+def get_text_size(text: str, font_scale: float = 0.5, thickness: int = 1) -> Tuple[int, int]:
+    """
+    Cached cv2.getTextSize for FONT_HERSHEY_SIMPLEX
+    Label strings repeat across frames, so each is measured once
+    """
+    return cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0]
+
+
 def draw_detections(frame: np.ndarray, detections: dict) -> np.ndarray:
     """
-    Draw bounding boxes and labels on frame
+    Draw bounding boxes and labels on frame (in place)
     
     Args:
-        frame: OpenCV image
+        frame: OpenCV image, modified in place (callers own a freshly decoded frame)
         detections: Detection dict with boxes, labels, confidences
         
     Returns:
         Annotated frame
     """
-    annotated = frame.copy()
-    
     boxes = detections.get('boxes', [])
     labels = detections.get('labels', [])
     confidences = detections.get('confidences', [])
     
-    # Color mapping for different threat types
-    color_map = {
-        'Human': (0, 255, 255),    # Yellow
-        'Weapon': (0, 0, 255),      # Red
-        'Vehicle': (255, 0, 0),     # Blue
-    }
+    human_color = COLOR_MAP['Human']
     
     for i, box in enumerate(boxes):
         x1, y1, x2, y2 = box
@@ -138,18 +298,16 @@ def draw_detections(frame: np.ndarray, detections: dict) -> np.ndarray:
         conf = confidences[i] if i < len(confidences) else 0.0
         
         # Get color for this label
-        color = color_map.get(label, (0, 255, 0))
+        color = human_color if label == 'Human' else COLOR_MAP.get(label, (0, 255, 0))
         
         # Draw bounding box
-        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
         
         # Draw label background
         label_text = f"{label} {conf:.2f}"
-        (text_width, text_height), _ = cv2.getTextSize(
-            label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1
-        )
+        text_width, text_height = get_text_size(label_text, 0.5, 1)
         cv2.rectangle(
-            annotated,
+            frame,
             (x1, y1 - text_height - 10),
             (x1 + text_width, y1),
             color,
@@ -158,7 +316,7 @@ def draw_detections(frame: np.ndarray, detections: dict) -> np.ndarray:
         
         # Draw label text
         cv2.putText(
-            annotated,
+            frame,
             label_text,
             (x1, y1 - 5),
             cv2.FONT_HERSHEY_SIMPLEX,
@@ -167,46 +325,37 @@ def draw_detections(frame: np.ndarray, detections: dict) -> np.ndarray:
             1
         )
     
-    return annotated
+    return frame
 
 
-async def process_camera_frame(frame_base64: str, camera_id: str, camera_sid: str) -> Optional[dict]:
+async def process_camera_frame(frame_data: Union[np.ndarray, bytes], camera_id: str, camera_sid: str) -> Optional[dict]:
     """
     Process incoming camera frame through AI pipeline
     
     Args:
-        frame_base64: Base64-encoded JPEG frame
+        frame_data: Frame already decoded off the event loop (see decode_and_resize),
+            or raw JPEG bytes
         camera_id: Camera identifier
         camera_sid: Socket.IO session ID
         
     Returns:
         Detection result dict with annotated frame and detections
     """
-    global ai_engine, camera_frame_counts, camera_detections_cache
+    global ai_engine, camera_detections_cache
     
     if ai_engine is None:
         await initialize_ai_engine()
     
-    # Decode frame
-    frame = decode_frame(frame_base64)
+    # Decode frame (unless the caller already did)
+    frame = frame_data if isinstance(frame_data, np.ndarray) else decode_frame(frame_data)
     if frame is None:
         return None
     
-    # Initialize state for new cameras
-    if camera_id not in camera_frame_counts:
-        camera_frame_counts[camera_id] = 0
-        camera_detections_cache[camera_id] = {'boxes': [], 'labels': [], 'confidences': [], 'count': 0}
-    
-    camera_frame_counts[camera_id] += 1
-    
-    # Run AI detection every 5th frame to maintain 50+ FPS smoothness
-    # We use cached boxes for intermediate frames
-    if camera_frame_counts[camera_id] % 5 == 0:
-        detections = await ai_engine.detect(frame, camera_id)
+    # Run AI detection only when the scene changed (or the cache is stale)
+    # We use cached boxes for static frames
+    if motion_gate.should_detect(camera_id, frame) or camera_id not in camera_detections_cache:
+        detections = await ai_engine.submit(frame, camera_id)
         camera_detections_cache[camera_id] = detections
-        # Reset count periodically to prevent overflow (though unlikely)
-        if camera_frame_counts[camera_id] > 1000:
-            camera_frame_counts[camera_id] = 0
     else:
         detections = camera_detections_cache[camera_id]
     
@@ -214,16 +363,16 @@ async def process_camera_frame(frame_base64: str, camera_id: str, camera_sid: st
     annotated_frame = draw_detections(frame, detections)
 
     # Encode annotated frame (Quality 30 for faster encoding and smaller frames)
-    annotated_base64 = encode_frame(annotated_frame, quality=30)
+    annotated_jpeg = encode_frame(annotated_frame, quality=30)
     
-    if annotated_base64 is None:
+    if annotated_jpeg is None:
         return None
     
     # Return complete result
     return {
         'camera_id': camera_id,
         'camera_sid': camera_sid,
-        'frame': annotated_base64,
+        'frame': annotated_jpeg,  # sent as a binary attachment by Socket.IO
         'detections': detections,
         'timestamp': asyncio.get_event_loop().time()
     }
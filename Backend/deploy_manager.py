@@ -19,20 +19,28 @@ Deployment States:
 """
 
 import logging
-from typing import Dict, Set, Optional
+from collections import deque
+from itertools import islice
+from types import MappingProxyType
+from typing import Deque, Dict, Mapping, Set, Optional
 from datetime import datetime
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class DeployManager:
-    """Manages camera deployment authorization and tracking"""
+    """
+    Manages camera deployment authorization and tracking
+    
+    All methods are called from the asyncio event loop thread only, so
+    deployment state is mutated without locks.
+    """
     
     def __init__(self):
         # Track deployment status
         self.deployed_cameras: Dict[str, dict] = {}  # sid -> deployment info
-        self.deployment_history: list = []  # Historical deployment records
+        # Historical deployment records (ring buffer, oldest dropped first)
+        self.deployment_history: Deque[dict] = deque(maxlen=10000)
         
     def deploy_camera(self, camera_sid: str, camera_id: str, admin_username: str) -> bool:
         """
@@ -119,6 +127,7 @@ class DeployManager:
     def increment_frame_count(self, camera_sid: str):
         """
         Increment frame count for deployed camera
+        Event loop thread only (see class docstring), so the increment cannot race
         
         Args:
             camera_sid: Socket.IO session ID of camera
@@ -138,10 +147,20 @@ class DeployManager:
         """
         return self.deployed_cameras.get(camera_sid)
     
-    def get_all_deployed(self) -> Dict[str, dict]:
+    def get_all_deployed(self) -> Mapping[str, dict]:
         """
         Get all currently deployed cameras
         
+        Returns:
+            Read-only live view of deployed cameras {sid: deployment_info}
+        """
+        return MappingProxyType(self.deployed_cameras)
+    
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Get a copy of all currently deployed cameras
+        Use this instead of get_all_deployed when the result is kept or mutated
+        
         Returns:
             Dict of deployed cameras {sid: deployment_info}
         """
@@ -157,7 +176,8 @@ class DeployManager:
         Returns:
             List of deployment history records
         """
-        return self.deployment_history[-limit:]
+        start = max(0, len(self.deployment_history) - limit)
+        return list(islice(self.deployment_history, start, None))
     
     def camera_disconnected(self, camera_sid: str):
         """
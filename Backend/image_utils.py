@@ -0,0 +1,75 @@
+"""
+Frame geometry helpers shared by the detection engines and the camera stream
+(resize-to-width, letterbox and the inverse box mapping)
+
+Import-side-effect free: no torch, no model or backend configuration
+"""
+
+import cv2
+import numpy as np
+from functools import lru_cache
+from typing import Optional, Tuple
+
+
+def letterbox_params(height: int, width: int, size: int = 640) -> Tuple[float, Tuple[int, int], Tuple[int, int]]:
+    """
+    Compute letterbox geometry for fitting a height x width frame into a size x size square
+    
+    Returns:
+        (unified scale ratio, (new_width, new_height), (pad_x, pad_y))
+    """
+    ratio = min(size / height, size / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    pad_x = (size - new_width) // 2
+    pad_y = (size - new_height) // 2
+    return ratio, (new_width, new_height), (pad_x, pad_y)
+
+
+@lru_cache(maxsize=64)
+def fit_width_params(height: int, width: int, max_width: int = 640) -> Optional[Tuple[int, int, float]]:
+    """
+    Compute the downscale that fits a height x width frame into max_width (aspect preserved)
+    Cameras stream a fixed resolution, so each shape is computed once
+    
+    Returns:
+        (new_width, new_height, scale factor), or None when the frame already fits
+    """
+    if width <= max_width:
+        return None
+    scale = max_width / width
+    return max_width, int(height * scale), scale
+
+
+def letterbox(frame: np.ndarray, size: int = 640, color: Tuple[int, int, int] = (114, 114, 114)) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Resize frame to fit a size x size square (aspect preserved) and pad the rest
+    
+    Returns:
+        (letterboxed frame, unified scale ratio, (pad_x, pad_y))
+    """
+    height, width = frame.shape[:2]
+    ratio, (new_width, new_height), (pad_x, pad_y) = letterbox_params(height, width, size)
+    
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    
+    padded = cv2.copyMakeBorder(
+        frame,
+        pad_y, size - new_height - pad_y,
+        pad_x, size - new_width - pad_x,
+        cv2.BORDER_CONSTANT,
+        value=color
+    )
+    return padded, ratio, (pad_x, pad_y)
+
+
+def unletterbox_boxes(xyxy: np.ndarray, ratio: float, pad: Tuple[int, int], shape: Tuple[int, int]) -> np.ndarray:
+    """
+    Map letterboxed xyxy boxes back to original frame coordinates in place
+    (remove padding, undo the unified scale, clip to the frame)
+    """
+    pad_x, pad_y = pad
+    height, width = shape
+    xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad_x) / ratio).clip(0, width)
+    xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad_y) / ratio).clip(0, height)
+    return xyxy
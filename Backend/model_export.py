@@ -0,0 +1,78 @@
+"""
+Cached TensorRT / ONNX exports of YOLO weights, shared by AIEngine and ModelWrapper
+
+Exports are written next to the .pt weights (best.pt -> best.engine), so both
+engines must build them with the same settings; they live here, once.
+"""
+
+import importlib.util
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from ultralytics import YOLO
+
+logger = logging.getLogger(__name__)
+
+# Fixed 640x640 input with a dynamic batch dimension up to EXPORT_BATCH frames
+EXPORT_IMGSZ = 640
+EXPORT_BATCH = 8
+
+# Optional dataset yaml with surveillance frames for INT8 calibration
+# (TensorRT only, tried when the FP16 export fails)
+INT8_CALIBRATION_DATA = os.getenv('GUARDX_INT8_CALIB_DATA')
+
+# format -> (file suffix, runtime module that must be installed, format-specific export args)
+_FORMATS = {
+    'engine': ('.engine', 'tensorrt', {'device': 0, 'workspace': 4}),
+    'onnx': ('.onnx', 'onnxruntime', {'simplify': True}),
+}
+
+
+def export_model(weights: Path, fmt: str) -> Optional[Path]:
+    """
+    Get the cached export of weights in fmt ('engine' or 'onnx'), exporting it
+    if missing or older than the weights
+
+    Returns:
+        Path to the exported model, or None when the runtime is not installed
+        or every export attempt failed (callers fall back to the .pt weights)
+    """
+    suffix, module, format_args = _FORMATS[fmt]
+
+    exported_path = weights.with_suffix(suffix)
+    if exported_path.exists():
+        # Weights replaced since the export (e.g. a new best.pt): export again
+        if not weights.exists() or exported_path.stat().st_mtime >= weights.stat().st_mtime:
+            return exported_path
+        logger.info(f"♻️ {weights.name} is newer than {exported_path.name}, re-exporting")
+
+    if not weights.exists() or importlib.util.find_spec(module) is None:
+        logger.warning(f"⚠️ {fmt} export unavailable for {weights}, using PyTorch weights")
+        return None
+
+    precisions = [{}]
+    if fmt == 'engine':
+        precisions = [{'half': True}]
+        if INT8_CALIBRATION_DATA:
+            precisions.append({'int8': True, 'data': INT8_CALIBRATION_DATA})
+
+    for precision in precisions:
+        try:
+            logger.info(f"⚙️ Exporting {weights.name} to {fmt} ({', '.join(precision) or 'fp32'})...")
+            exported = YOLO(str(weights)).export(
+                format=fmt,
+                imgsz=EXPORT_IMGSZ,
+                dynamic=True,
+                batch=EXPORT_BATCH,
+                **format_args,
+                **precision
+            )
+            if exported and Path(exported).exists():
+                logger.info(f"✅ Exported model cached at: {exported}")
+                return Path(exported)
+        except Exception as e:
+            logger.error(f"❌ {fmt} export failed for {weights.name}: {e}")
+
+    return None
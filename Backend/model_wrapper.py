@@ -6,13 +6,85 @@ from pathlib import Path
 import time
 from PIL import Image
 import asyncio
+import logging
+from image_utils import fit_width_params
+from model_export import EXPORT_BATCH, export_model
+
+logger = logging.getLogger(__name__)
+
+HUMAN_CLASS_NAMES = ['person', 'human']
+
+# Real-time frames are resized to a fixed 640 width, so cuDNN can cache its conv algorithm choice
+torch.backends.cudnn.benchmark = True
+
+class InferenceBatcher:
+    """
+    Coalesces items submitted within max_wait_ms into a single batched call
+    
+    run_batch receives a list of items and must return one result per item,
+    in order. Each submit() awaits the result for its own item.
+    """
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=15, maxsize=64):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self._worker = None
+    
+    def start(self):
+        """Start the worker coroutine (needs a running event loop)"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    async def submit(self, item):
+        """Queue an item and wait for its result"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            items = [item for item, _ in batch]
+            try:
+                results = self.run_batch(items)
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
 
 class ModelWrapper:
     def __init__(self):
         self.models = {}
         self.active_model_name = None
         self.confidence_threshold = 0.5
+        # Run every loaded model per frame instead of only the active one
+        self.ensemble = False
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        # FP16 weights and inputs on CUDA (halves memory traffic, uses Tensor Cores)
+        self.half = self.device == 'cuda'
+        # Real-time frames from all streams share one batched YOLO call
+        # (no larger than the dynamic batch the exported models accept)
+        self.max_batch = EXPORT_BATCH
+        self.batcher = InferenceBatcher(self._detect_frame_batch, max_batch_size=self.max_batch, max_wait_ms=15)
+        # Exported TensorRT / ONNX models are cached next to the .pt weights (see model_export)
+        self.model_backends = {}  # model name -> 'torch' | 'engine' | 'onnx'
+        self._person_class_ids = {}  # model name -> class ids whose name is person/human
         
     async def load_models(self):
         """Load both custom and fallback models"""
@@ -32,8 +104,7 @@ class ModelWrapper:
             print(f"🔍 Checking for custom model at: {path.absolute()}")
             if path.exists():
                 try:
-                    model = YOLO(str(path))
-                    model.to(self.device)
+                    model = self._load_model('custom', path)
                     self.models['custom'] = model
                     self.active_model_name = 'custom'
                     print(f"✅ Custom model loaded successfully from: {path} on {self.device}")
@@ -44,8 +115,7 @@ class ModelWrapper:
         # Load fallback YOLO model if custom not loaded or as a backup
         try:
             print(f"🔍 Loading fallback YOLO model on {self.device}...")
-            model = YOLO('yolov8n.pt')
-            model.to(self.device)
+            model = self._load_model('yolo', Path('yolov8n.pt'))
             self.models['yolo'] = model
             if not self.active_model_name:
                 self.active_model_name = 'yolo'
@@ -55,11 +125,58 @@ class ModelWrapper:
             
         print(f"🎯 Final Active model: {self.active_model_name}")
         print(f"📦 Loaded models: {list(self.models.keys())}")
+        
+        if self.models:
+            self.batcher.start()
+    
+    def _load_model(self, name, weights):
+        """
+        Load the exported model for weights if available, otherwise the PyTorch model
+        TensorRT engine on CUDA, ONNX (run by onnxruntime) on CPU
+        """
+        model = None
+        exported_path = export_model(weights, 'engine' if self.device == 'cuda' else 'onnx')
+        if exported_path is not None:
+            try:
+                model = YOLO(str(exported_path), task='detect')
+                self.model_backends[name] = 'engine' if exported_path.suffix == '.engine' else 'onnx'
+            except Exception as e:
+                logger.error(f"❌ Exported model failed from {exported_path}: {e}")
+        
+        if model is None:
+            model = self._prepare_model(YOLO(str(weights)))
+            self.model_backends[name] = 'torch'
+        
+        # Resolve Human class names to ids once so filtering is an integer lookup per frame
+        self._person_class_ids[name] = np.array(
+            [cls for cls, cls_name in model.names.items() if cls_name.lower() in HUMAN_CLASS_NAMES],
+            dtype=int
+        )
+        return model
+    
+    def _prepare_model(self, model):
+        """Move a YOLO model to the device, fuse Conv+BN and cast to FP16 on CUDA"""
+        model.to(self.device)
+        try:
+            model.fuse()
+        except Exception as e:
+            logger.warning(f"⚠️ Layer fusion skipped: {e}")
+        if self.half:
+            model.model.half()
+        return model
+    
+    def _inference_models(self):
+        """Models to run per frame: the active one, or all of them in ensemble mode"""
+        if self.ensemble:
+            return list(self.models.items())
+        if self.active_model_name in self.models:
+            return [(self.active_model_name, self.models[self.active_model_name])]
+        return []
     
     async def detect_humans(self, image, confidence=None):
-        """Enhanced human detection with better accuracy using all loaded models"""
+        """Human detection with the active model (or all loaded models in ensemble mode)"""
         conf = confidence or self.confidence_threshold
-        print(f"🔄 Starting detection with all loaded models, threshold: {conf}")
+        print(f"🔄 Starting detection with {[name for name, _ in self._inference_models()]}, threshold: {conf}")
         
         if not self.models:
             print("❌ No models loaded!")
@@ -70,38 +187,27 @@ class ModelWrapper:
         # Convert PIL to numpy array
         img_array = np.array(image)
         
-        # Extract results from all models
+        # Extract results from the selected models
         boxes = []
         confidences = []
         labels = []
         
-        for model_name, model in self.models.items():
+        for model_name, model in self._inference_models():
             print(f"🤖 Running {model_name} detection...")
             try:
-                if model_name == 'yolo':
-                    results = model(img_array, conf=conf, classes=[0])  # class 0 = person
-                else:
-                    results = model(img_array, conf=conf)
+                # half must match the weights, otherwise the predictor casts the model back to FP32
+                with torch.inference_mode():
+                    if model_name == 'yolo':
+                        results = model(img_array, conf=conf, classes=[0], half=self.half)  # class 0 = person
+                    else:
+                        results = model(img_array, conf=conf, half=self.half)
                 
                 if len(results) > 0 and results[0].boxes is not None:
                     print(f"📦 Model {model_name} found {len(results[0].boxes)} boxes")
-                    for i, box in enumerate(results[0].boxes):
-                        coords = box.xyxy[0].cpu().numpy()
-                        confidence_val = box.conf[0].cpu().numpy()
-                        cls = int(box.cls[0].cpu().numpy())
-                        
-                        class_name = results[0].names[cls] if hasattr(results[0], 'names') else 'Unknown'
-                        
-                        # Filter for Human detections only
-                        if class_name.lower() not in ['person', 'human']:
-                            continue
-                            
-                        boxes.append([
-                            float(coords[0]), float(coords[1]), 
-                            float(coords[2]), float(coords[3])
-                        ])
-                        confidences.append(float(confidence_val))
-                        labels.append(class_name)
+                    model_boxes, model_confs, model_labels = self._extract_humans(results[0], self._person_class_ids[model_name])
+                    boxes.extend(model_boxes)
+                    confidences.extend(model_confs)
+                    labels.extend(model_labels)
             except Exception as e:
                 print(f"❌ Error with model {model_name}: {e}")
         
@@ -112,7 +218,7 @@ class ModelWrapper:
             "count": len(boxes),
             "confidences": confidences,
             "labels": labels,
-            "model_type": "multi-model",
+            "model_type": "multi-model" if self.ensemble else self.active_model_name,
             "processing_time": round(processing_time, 3),
             "confidence_threshold": conf
         }
@@ -121,79 +227,91 @@ class ModelWrapper:
         return result
     
     async def detect_realtime_frame(self, frame):
-        """Optimized detection for real-time video frames"""
+        """Optimized detection for real-time video frames (batched across streams)"""
         if not self.models or self.active_model_name not in self.models:
             return {"boxes": [], "count": 0, "confidences": []}
-            
-        model = self.models[self.active_model_name]
         
         try:
-            # Resize frame for faster processing
-            height, width = frame.shape[:2]
+            # Resize frame for faster processing (resize geometry is cached per frame shape)
             scale_factor = 1.0
+            params = fit_width_params(*frame.shape[:2], 640)
+            if params is not None:
+                new_width, new_height, scale_factor = params
+                frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_AREA)
             
-            if width > 640:
-                scale_factor = 640 / width
-                new_width = 640
-                new_height = int(height * scale_factor)
-                frame = cv2.resize(frame, (new_width, new_height))
-                
-            boxes = []
-            confidences = []
-            labels = []
-            
-            # Using 0.25 instead of 0.3 for better sensitivity
-            detection_conf = 0.25
-            
-            # Run detection on all loaded models to ensure maximum coverage
-            for model_name, model in self.models.items():
-                try:
-                    # For standard YOLO, we can filter for persons (class 0)
-                    if model_name == 'yolo':
-                        results = model(frame, conf=detection_conf, classes=[0], verbose=False)
-                    else:
-                        results = model(frame, conf=detection_conf, verbose=False)
-                    
-                    if len(results) > 0 and results[0].boxes is not None:
-                        for box in results[0].boxes:
-                            coords = box.xyxy[0].cpu().numpy()
-                            confidence = box.conf[0].cpu().numpy()
-                            cls = int(box.cls[0].cpu().numpy())
-                            
-                            # Get class name
-                            class_name = results[0].names[cls] if hasattr(results[0], 'names') else 'Unknown'
-                            
-                            # Filter for Human detections only
-                            if class_name.lower() not in ['person', 'human']:
-                                continue
-                                
-                            # Scale back to original size if resized
-                            if scale_factor != 1.0:
-                                coords = coords / scale_factor
-                            
-                            boxes.append([
-                                float(coords[0]), float(coords[1]), 
-                                float(coords[2]), float(coords[3])
-                            ])
-                            confidences.append(float(confidence))
-                            labels.append(class_name)
-                            
-                        if len(results[0].boxes) > 0:
-                            print(f"🤖 Model {model_name} detected {len(results[0].boxes)} objects")
-                except Exception as e:
-                    print(f"❌ Error with model {model_name}: {e}")
-            
-            return {
-                "boxes": boxes,
-                "count": len(boxes),
-                "confidences": confidences,
-                "labels": labels
-            }
+            return await self.batcher.submit((frame, scale_factor))
             
         except Exception as e:
             print(f"❌ Real-time detection error: {e}")
             return {"boxes": [], "count": 0, "confidences": []}
     
+    def _detect_frame_batch(self, items):
+        """Run one YOLO call per selected model over a batch of (resized frame, scale_factor) items"""
+        frames = [frame for frame, _ in items]
+        
+        batch_results = [
+            {"boxes": [], "confidences": [], "labels": []}
+            for _ in items
+        ]
+        
+        # Using 0.25 instead of 0.3 for better sensitivity
+        detection_conf = 0.25
+        
+        # Only the active model runs unless ensemble mode asks for every loaded one
+        for model_name, model in self._inference_models():
+            try:
+                # Ultralytics batches a list of frames (shapes may differ) in a single call
+                # For standard YOLO, we can filter for persons (class 0)
+                with torch.inference_mode():
+                    if model_name == 'yolo':
+                        results = model(frames, conf=detection_conf, classes=[0], half=self.half, verbose=False)
+                    else:
+                        results = model(frames, conf=detection_conf, half=self.half, verbose=False)
+                
+                for result, (_, scale_factor), out in zip(results, items, batch_results):
+                    if result.boxes is None:
+                        continue
+                    
+                    model_boxes, model_confs, model_labels = self._extract_humans(
+                        result, self._person_class_ids[model_name], scale_factor
+                    )
+                    out["boxes"].extend(model_boxes)
+                    out["confidences"].extend(model_confs)
+                    out["labels"].extend(model_labels)
+                    
+                    if len(result.boxes) > 0:
+                        print(f"🤖 Model {model_name} detected {len(result.boxes)} objects")
+            except Exception as e:
+                print(f"❌ Error with model {model_name}: {e}")
+        
+        for out in batch_results:
+            out["count"] = len(out["boxes"])
+        
+        return batch_results
+    
+    def _extract_humans(self, result, person_class_ids, scale_factor=1.0):
+        """Pull Human boxes out of one YOLO result with a single host copy per tensor"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return [], [], []
+        
+        # One device->host transfer per tensor instead of three per box
+        xyxy = boxes.xyxy.cpu().numpy()
+        confs = boxes.conf.cpu().numpy()
+        clss = boxes.cls.cpu().numpy().astype(int)
+        
+        # Filter for Human detections only
+        mask = np.isin(clss, person_class_ids)
+        xyxy, confs, clss = xyxy[mask], confs[mask], clss[mask]
+        
+        # Scale back to original size if resized
+        if scale_factor != 1.0:
+            xyxy *= 1.0 / scale_factor
+        
+        # Names are only looked up for the boxes that survived the mask
+        names = result.names
+        return xyxy.tolist(), confs.tolist(), [names[c] for c in clss.tolist()]
+    
     async def get_health_status(self):
         """Get model health status"""
         return {
@@ -206,6 +324,7 @@ class ModelWrapper:
                 name: {
                     "loaded": True,
                     "type": "YOLO" if name == "yolo" else "Custom",
+                    "backend": self.model_backends.get(name, "torch"),
                     "status": "OPERATIONAL"
                 } for name in self.models.keys()
             }
@@ -0,0 +1,9 @@
+@echo off
+REM Run test_startup.py from precompiled bytecode (skips parsing the source on every run)
+REM -S/-I are not used: the checks need site-packages and the Backend directory on sys.path
+cd /d "%~dp0"
+
+python -c "import os, py_compile; stale = not os.path.exists('test_startup.pyc') or os.path.getmtime('test_startup.py') > os.path.getmtime('test_startup.pyc'); stale and py_compile.compile('test_startup.py', 'test_startup.pyc', doraise=True)"
+if errorlevel 1 exit /b 1
+
+python -E -B test_startup.pyc %*
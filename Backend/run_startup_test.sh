@@ -0,0 +1,11 @@
+#!/bin/sh
+# Run test_startup.py from precompiled bytecode (skips parsing the source on every run)
+# -S/-I are not used: the checks need site-packages and the Backend directory on sys.path
+cd "$(dirname "$0")" || exit 1
+PYTHON="${PYTHON:-python3}"
+
+if [ ! -f test_startup.pyc ] || [ test_startup.py -nt test_startup.pyc ]; then
+    "$PYTHON" -c "import py_compile; py_compile.compile('test_startup.py', 'test_startup.pyc', doraise=True)" || exit 1
+fi
+
+exec "$PYTHON" -E -B test_startup.pyc "$@"
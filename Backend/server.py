@@ -1,7 +1,16 @@
+import logging
+import os
 import uvicorn
 from pathlib import Path
 import socketio
 
+# Configure logging once for the whole process, before any module creates its logger
+# Modules only call logging.getLogger(__name__); set LOG_LEVEL=INFO for connection/deploy events
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'WARNING').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+
 # Import FastAPI app
 from app import app as fastapi_app
 
@@ -24,8 +24,8 @@ def main():
     print("=" * 40)
     
     # Check Python version
-    if sys.version_info < (3, 8):
-        print("❌ Python 3.8+ required")
+    if sys.version_info < (3, 10):
+        print("❌ Python 3.10+ required")
         return False
     
     print(f"Python {sys.version}")
@@ -16,41 +16,114 @@ Responsibilities:
 
 import socketio
 import asyncio
-from typing import Dict, Set
-from jose import jwt, JWTError
-from auth import SECRET_KEY, ALGORITHM
+import orjson
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional
+from jose import JWTError
+from auth import decode_token
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Semaphore to limit concurrent AI processing (prevent CPU overload)
-# Increased to 32 for better throughput with 6+ cameras at 10 FPS
+# Each camera has at most one frame in flight, so this caps the number of cameras processed at once
 ai_semaphore = asyncio.Semaphore(32)
 
+# Pool for JPEG decode + resize so CPU-bound preprocessing never blocks the event loop
+# Threads (not processes): cv2/TurboJPEG release the GIL and decoded frames need no pickling
+preproc_pool = ThreadPoolExecutor(
+    max_workers=max(1, (os.cpu_count() or 2) // 2),
+    thread_name_prefix='guardx-preproc'
+)
+
+class OrjsonSerializer:
+    """json-compatible module for python-socketio backed by orjson (detection payloads are float-heavy)"""
+    
+    @staticmethod
+    def dumps(obj, **kwargs):
+        # python-socketio passes stdlib json kwargs (separators); orjson output is already compact
+        return orjson.dumps(obj).decode('utf-8')
+    
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+
+# Per-packet Socket.IO/Engine.IO logging is off by default (it logs every frame)
+# Set GUARDX_SIO_DEBUG=1 to turn it back on
+SIO_DEBUG = os.getenv('GUARDX_SIO_DEBUG', '0') == '1'
+
 # Create Socket.IO server with CORS support
 # Allow all origins for local network deployment
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins='*',  # Allow all origins for local network
-    logger=True,
-    engineio_logger=True,
-    max_http_buffer_size=5000000,  # Increase buffer size to 5MB for video frames
+    json=OrjsonSerializer,
+    logger=SIO_DEBUG,
+    engineio_logger=SIO_DEBUG,
+    max_http_buffer_size=750000,  # Binary JPEG frames; 750KB covers a 720p frame
     ping_timeout=20,
     ping_interval=10
 )
 
-# Track connected clients
-connected_cameras: Dict[str, dict] = {}  # sid -> {username, camera_id, deployed}
-connected_admins: Set[str] = set()  # set of admin sids
-deployed_cameras: Set[str] = set()  # set of deployed camera sids
+
+
+@dataclass(slots=True)
+class ClientState:
+    """State of one connected Socket.IO client (admin or camera)"""
+    role: str
+    username: str
+    camera_id: Optional[str] = None
+    deployed: bool = False
+    
+    @property
+    def is_admin(self) -> bool:
+        return self.role == 'ADMIN'
+
+
+# Track connected clients: one lookup per frame answers "known camera?" and "deployed?"
+clients: Dict[str, ClientState] = {}  # sid -> client state
+
+# Detection results are coalesced per camera and flushed to admins as one
+# 'detection:batch' event every BROADCAST_INTERVAL seconds (latest result wins)
+BROADCAST_INTERVAL = 0.1
+pending_broadcasts: Dict[str, dict] = {}  # camera sid -> latest detection result
+_broadcast_task: Optional[asyncio.Task] = None
+
+# Latest-only frame slot per camera: a new frame overwrites one still waiting,
+# so a camera never has more than one frame queued behind inference
+latest_frames: Dict[str, bytes] = {}  # camera sid -> newest unprocessed JPEG
+frame_workers: Dict[str, asyncio.Task] = {}  # camera sid -> running worker
+
+
+async def _flush_broadcasts():
+    """Send pending detection results to admins until the last admin leaves"""
+    while any(client.is_admin for client in clients.values()):
+        await asyncio.sleep(BROADCAST_INTERVAL)
+        if pending_broadcasts:
+            batch = list(pending_broadcasts.values())
+            pending_broadcasts.clear()
+            # A room emit encodes the packet once and reuses it for every admin in the room
+            try:
+                await sio.emit('detection:batch', batch, room='admin_room')
+            except Exception as e:
+                logger.error(f"❌ Detection broadcast failed: {e}")
+    pending_broadcasts.clear()
+
+
+def _ensure_broadcast_task():
+    """Start the broadcast flusher if it is not already running"""
+    global _broadcast_task
+    if _broadcast_task is None or _broadcast_task.done():
+        _broadcast_task = asyncio.create_task(_flush_broadcasts())
 
 
 def verify_token(token: str) -> dict:
-    """Verify JWT token and extract user data"""
+    """Verify JWT token and extract user data (cached in auth.decode_token)"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        return decode_token(token)
     except JWTError as e:
         logger.error(f"Token verification failed: {e}")
         return None
@@ -63,7 +136,7 @@ async def connect(sid, environ, auth):
     Authenticate using JWT token from auth dict
     """
     logger.info(f"🔌 New connection attempt: {sid}")
-    logger.info(f"   Auth data: {auth}")
+    logger.debug("   Auth data: %s", auth)
     
     token = None
     if auth and 'token' in auth:
@@ -82,7 +155,7 @@ async def connect(sid, environ, auth):
         logger.warning(f"❌ Connection rejected - no token: {sid}")
         return False
     
-    logger.info(f"   Token received: {token[:20]}..." if token else "   Token: None")
+    logger.debug("   Token received: %s...", token[:20])
     user_data = verify_token(token)
     
     if not user_data:
@@ -97,29 +170,27 @@ async def connect(sid, environ, auth):
     # Join appropriate room based on role
     if role == 'ADMIN':
         await sio.enter_room(sid, 'admin_room')
-        connected_admins.add(sid)
+        clients[sid] = ClientState(role=role, username=username)
+        _ensure_broadcast_task()
         logger.info(f"👑 Admin joined: {username} - {sid}")
         
         # Send current camera list to admin
         camera_list = [
             {
                 'sid': cam_sid,
-                'username': cam_data['username'],
-                'camera_id': cam_data['camera_id'],
-                'deployed': cam_data['deployed']
+                'username': client.username,
+                'camera_id': client.camera_id,
+                'deployed': client.deployed
             }
-            for cam_sid, cam_data in connected_cameras.items()
+            for cam_sid, client in clients.items()
+            if not client.is_admin
         ]
         await sio.emit('camera:list', {'cameras': camera_list}, room=sid)
         
     else:
         # Camera client
         camera_id = user_data.get('camera_id', username)
-        connected_cameras[sid] = {
-            'username': username,
-            'camera_id': camera_id,
-            'deployed': False
-        }
+        clients[sid] = ClientState(role=role, username=username, camera_id=camera_id)
         await sio.enter_room(sid, 'camera_room')
         logger.info(f"📹 Camera joined: {camera_id} - {sid}")
         
@@ -138,19 +209,23 @@ async def disconnect(sid):
     """Handle client disconnect"""
     logger.info(f"🔌 Disconnect: {sid}")
     
-    # Check if admin
-    if sid in connected_admins:
-        connected_admins.remove(sid)
-        logger.info(f"👑 Admin disconnected: {sid}")
+    client = clients.pop(sid, None)
+    if client is None:
+        return
     
-    # Check if camera
-    if sid in connected_cameras:
-        camera_data = connected_cameras[sid]
-        camera_id = camera_data['camera_id']
-        del connected_cameras[sid]
+    if client.is_admin:
+        logger.info(f"👑 Admin disconnected: {sid}")
+    else:
+        camera_id = client.camera_id
+        pending_broadcasts.pop(sid, None)
+        latest_frames.pop(sid, None)
+        worker = frame_workers.pop(sid, None)
+        if worker is not None:
+            worker.cancel()
         
-        if sid in deployed_cameras:
-            deployed_cameras.remove(sid)
+        # Import here to avoid circular dependency
+        from camera_stream import motion_gate
+        motion_gate.forget(camera_id)
         
         logger.info(f"📹 Camera disconnected: {camera_id} - {sid}")
         
@@ -167,13 +242,15 @@ async def deploy_start(sid, data):
     Admin command to deploy a camera
     Only admins can issue this command
     """
-    if sid not in connected_admins:
+    admin = clients.get(sid)
+    if admin is None or not admin.is_admin:
         logger.warning(f"❌ Unauthorized deploy attempt from: {sid}")
         return
 
     target_sid = data.get('camera_sid')
+    camera = clients.get(target_sid)
 
-    if target_sid not in connected_cameras:
+    if camera is None or camera.is_admin:
         logger.warning(f"❌ Camera not found: {target_sid}")
         await sio.emit('deploy:failed', {
             'error': 'Camera not connected'
@@ -181,10 +258,9 @@ async def deploy_start(sid, data):
         return
 
     # Mark camera as deployed
-    connected_cameras[target_sid]['deployed'] = True
-    deployed_cameras.add(target_sid)
+    camera.deployed = True
 
-    camera_id = connected_cameras[target_sid]['camera_id']
+    camera_id = camera.camera_id
     logger.info(f"🚀 Deploying camera: {camera_id} - {target_sid}")
 
     # Send deploy command to camera
@@ -206,22 +282,22 @@ async def deploy_stop(sid, data):
     Admin command to stop a camera
     Only admins can issue this command
     """
-    if sid not in connected_admins:
+    admin = clients.get(sid)
+    if admin is None or not admin.is_admin:
         logger.warning(f"❌ Unauthorized stop attempt from: {sid}")
         return
 
     target_sid = data.get('camera_sid')
+    camera = clients.get(target_sid)
 
-    if target_sid not in connected_cameras:
+    if camera is None or camera.is_admin:
         logger.warning(f"❌ Camera not found: {target_sid}")
         return
 
     # Mark camera as not deployed
-    connected_cameras[target_sid]['deployed'] = False
-    if target_sid in deployed_cameras:
-        deployed_cameras.remove(target_sid)
+    camera.deployed = False
 
-    camera_id = connected_cameras[target_sid]['camera_id']
+    camera_id = camera.camera_id
     logger.info(f"🛑 Stopping camera: {camera_id} - {target_sid}")
 
     # Send stop command to camera
@@ -237,43 +313,74 @@ async def camera_frame(sid, data):
     Receive video frame from camera client
     Only deployed cameras can send frames
     """
-    if sid not in connected_cameras:
-        logger.warning(f"❌ Unauthorized frame from: {sid}")
+    client = clients.get(sid)
+    if client is None or client.is_admin:
+        logger.warning("❌ Unauthorized frame from: %s", sid)
         return
 
-    if sid not in deployed_cameras:
-        logger.warning(f"❌ Frame from non-deployed camera: {sid}")
+    if not client.deployed:
+        # Cameras may still send a few frames after deploy_stop, so keep this quiet
+        logger.debug("❌ Frame from non-deployed camera: %s", sid)
         return
 
-    camera_id = connected_cameras[sid]['camera_id']
-    frame_data = data.get('frame')
+    camera_id = client.camera_id
+    # Raw JPEG bytes sent as a binary Socket.IO attachment
+    frame_data = data
 
-    if not frame_data:
+    if not isinstance(frame_data, (bytes, bytearray)) or not frame_data:
         return
 
-    # logger.info(f"📸 Received frame from {camera_id} ({len(frame_data)} bytes)")
+    # Overwrite any frame still waiting; start a worker if this camera has none
+    latest_frames[sid] = frame_data
+    if sid not in frame_workers:
+        frame_workers[sid] = asyncio.create_task(_camera_worker(sid, camera_id))
+
 
+async def _camera_worker(sid: str, camera_id: str):
+    """Process a camera's newest frame until no fresh frame is waiting"""
+    try:
+        while True:
+            frame_data = latest_frames.pop(sid, None)
+            if frame_data is None:
+                return
+            await _process_frame(sid, camera_id, frame_data)
+    finally:
+        # Also on cancellation, so the next frame:send can start a fresh worker
+        frame_workers.pop(sid, None)
+
+
+async def _process_frame(sid: str, camera_id: str, frame_data: bytes):
+    """Run one camera frame through the AI pipeline and queue the result for admins"""
     try:
         async with ai_semaphore:
             # Import here to avoid circular dependency
-            from camera_stream import process_camera_frame
-
-            # Process frame through AI engine
-            detection_result = await process_camera_frame(frame_data, camera_id, sid)
-
-            # Broadcast to admins only (not back to operator to reduce their CPU load)
+            from camera_stream import process_camera_frame, decode_and_resize, frame_pool
+
+            # Decode + resize on the preprocessing pool, only inference stays on the loop
+            loop = asyncio.get_running_loop()
+            frame = await loop.run_in_executor(preproc_pool, decode_and_resize, frame_data, 640)
+            if frame is None:
+                return
+
+            # Process frame through AI engine; the annotated JPEG is encoded by the time
+            # it returns, so the frame buffer can go straight back to the pool
+            try:
+                detection_result = await process_camera_frame(frame, camera_id, sid)
+            finally:
+                frame_pool.release(frame)
+
+            # Queue for the next admin broadcast (not back to operator to reduce their CPU load);
+            # a camera that disconnected during inference is not re-added
             if detection_result:
-                # logger.info(f"📡 Broadcasting detection for {camera_id} to admin_room")
-                await sio.emit('detection:result', detection_result, room='admin_room')
+                if sid in clients:
+                    pending_broadcasts[sid] = detection_result
                 # REMOVED: Sending back to operator - reduces their rendering overhead by 50%
                 # await sio.emit('detection:result', detection_result, room=sid)
             else:
-                logger.warning(f"⚠️ process_camera_frame returned None for {camera_id}")
+                logger.warning("⚠️ process_camera_frame returned None for %s", camera_id)
             
     except Exception as e:
-        logger.error(f"❌ Error processing camera frame from {camera_id}: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception("❌ Error processing camera frame from %s: %s", camera_id, e)
 
 
 # Export socket server and utilities
@@ -289,10 +396,10 @@ def get_sio():
 
 def get_connected_cameras():
     """Get list of connected cameras"""
-    return connected_cameras
+    return {sid: client for sid, client in clients.items() if not client.is_admin}
 
 
 def get_deployed_cameras():
     """Get list of deployed cameras"""
-    return deployed_cameras
+    return {sid for sid, client in clients.items() if client.deployed}
 
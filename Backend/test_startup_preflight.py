@@ -0,0 +1,45 @@
+"""
+Tests for the native-library preflight in test_startup.py
+Run with: python -m pytest test_startup_preflight.py
+"""
+
+import importlib.machinery
+import importlib.util
+import os
+
+import test_startup
+
+
+def test_find_extension_missing_package():
+    """A package that is not installed has no extension to preflight"""
+    assert test_startup.find_extension("guardx_missing_package", ("_C",)) == (None, ())
+
+
+def test_preflight_native_missing_package(monkeypatch):
+    """Missing torch/cv2/cryptography leaves the error to the real import instead of crashing"""
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    for name in test_startup.NATIVE_LIBRARIES:
+        assert test_startup.preflight_native(name) is None
+
+
+def test_probe_import_missing_package(monkeypatch):
+    """--verbose reports a missing package as an ImportError"""
+    monkeypatch.setitem(test_startup.NATIVE_DEPENDENCIES, "guardx_missing_package", ("torch",))
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    package = (5, "Missing", "guardx_missing_package", ("guardx-missing-package",), "pip install nothing")
+    version, error = test_startup.probe_import(package)
+    assert version is None
+    assert isinstance(error, ImportError)
+
+
+def test_preflight_native_broken_library(tmp_path, monkeypatch):
+    """A truncated extension module is reported with the loader error"""
+    package_dir = tmp_path / "cv2"
+    package_dir.mkdir()
+    (package_dir / "__init__.py").write_text("")
+    suffix = importlib.machinery.EXTENSION_SUFFIXES[0]
+    (package_dir / ("cv2" + suffix)).write_bytes(b"not a shared library")
+    monkeypatch.syspath_prepend(os.fspath(tmp_path))
+
+    error = test_startup.preflight_native("cv2")
+    assert error is not None and "cv2 native library failed to load" in error
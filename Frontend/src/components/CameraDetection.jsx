@@ -2,6 +2,8 @@ import { useState, useEffect, useRef } from 'react';
 import { Camera, Square, Play, Pause, AlertTriangle, Users, Wifi, WifiOff, MapPin, Navigation, Crosshair } from 'lucide-react';
 import VideoTile from './VideoTile';
 
+const textDecoder = new TextDecoder();
+
 export default function CameraDetection() {
   const [isStreaming, setIsStreaming] = useState(false);
   const [connectionStatus, setConnectionStatus] = useState('disconnected');
@@ -147,6 +149,8 @@ export default function CameraDetection() {
     console.log('🔌 Connecting to:', wsUrl);
     
     wsRef.current = new WebSocket(wsUrl);
+    // Detection frames arrive as binary (UTF-8 JSON) messages
+    wsRef.current.binaryType = 'arraybuffer';
 
     wsRef.current.onopen = () => {
       console.log('✅ WebSocket connected');
@@ -154,7 +158,8 @@ export default function CameraDetection() {
     };
 
     wsRef.current.onmessage = (event) => {
-      const message = JSON.parse(event.data);
+      const raw = typeof event.data === 'string' ? event.data : textDecoder.decode(event.data);
+      const message = JSON.parse(raw);
       console.log('📨 Received:', message);
       
       switch (message.type) {
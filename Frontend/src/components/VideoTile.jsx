@@ -4,7 +4,7 @@
  * Displays individual camera feed with AI detection overlays.
  * 
  * Responsibilities:
- * - Render video frame from base64 JPEG
+ * - Render video frame from raw JPEG bytes (or legacy base64 string)
  * - Draw bounding boxes over detections
  * - Display camera ID and status
  * - Show detection count and labels
@@ -19,6 +19,15 @@ import { Camera, AlertTriangle, Maximize2 } from 'lucide-react';
 function VideoTile({ detection, minimal = false, fullscreen = false, onClick }) {
   const canvasRef = useRef(null);
   const imageRef = useRef(null);
+  const frameUrlRef = useRef(null);
+
+  // Release the object URL of the frame currently being decoded, if any
+  const revokeFrameUrl = () => {
+    if (frameUrlRef.current) {
+      URL.revokeObjectURL(frameUrlRef.current);
+      frameUrlRef.current = null;
+    }
+  };
 
   // Render frame on canvas
   useEffect(() => {
@@ -52,6 +61,7 @@ function VideoTile({ detection, minimal = false, fullscreen = false, onClick })
     };
 
     img.onerror = () => {
+      revokeFrameUrl();
       console.error('❌ VideoTile: Failed to load image frame');
       ctx.fillStyle = '#333';
       ctx.fillRect(0, 0, canvas.width || 300, canvas.height || 200);
@@ -59,12 +69,24 @@ function VideoTile({ detection, minimal = false, fullscreen = false, onClick })
       ctx.fillText('Frame Load Error', 10, 20);
     };
 
-    // Ensure we handle the base64 prefix correctly
-    if (detection.frame.startsWith('data:image')) {
+    // Binary frames arrive as ArrayBuffer; decode via a short-lived object URL
+    if (typeof detection.frame !== 'string') {
+      const url = URL.createObjectURL(new Blob([detection.frame], { type: 'image/jpeg' }));
+      frameUrlRef.current = url;
+      const handleLoad = img.onload;
+      img.onload = () => {
+        revokeFrameUrl();
+        handleLoad();
+      };
+      img.src = url;
+    } else if (detection.frame.startsWith('data:image')) {
       img.src = detection.frame;
     } else {
       img.src = `data:image/jpeg;base64,${detection.frame}`;
     }
+
+    // A newer frame (or unmount) can replace this one before it loads; release its blob either way
+    return revokeFrameUrl;
   }, [detection]);
 
   // Draw bounding boxes and labels
@@ -100,37 +100,34 @@ export default function AdminDashboard() {
       });
     });
 
-    // Detection events
-    socketInstance.on('detection:result', (data) => {
-      console.log(' Detection result received:', {
-        camera_sid: data.camera_sid,
-        camera_id: data.camera_id,
-        hasFrame: !!data.frame,
-        frameSize: data.frame ? data.frame.length : 0,
-        detectionCount: data.detections?.count || 0,
-        timestamp: data.timestamp
-      });
-
-      // Batch state updates to prevent nested re-renders
-      setDetections(prevDetections => {
-        const updatedDetections = {
-          ...prevDetections,
-          [data.camera_sid]: data
-        };
-        return updatedDetections;
-      });
+    // Detection events (coalesced server-side, one batch every ~100ms)
+    socketInstance.on('detection:batch', (batch) => {
+      if (!Array.isArray(batch) || batch.length === 0) return;
+
+      const latestByCamera = {};
+      let newDetectionCount = 0;
+      for (const data of batch) {
+        latestByCamera[data.camera_sid] = data;
+        newDetectionCount += data.detections?.count || 0;
+      }
+
+      // One state update per batch instead of one per frame
+      setDetections(prevDetections => ({
+        ...prevDetections,
+        ...latestByCamera
+      }));
 
       // Update stats separately to avoid nested state updates
       setStats(prevStats => {
         // Calculate active threats from current detections + new data
         const currentActiveThreats = Object.values({
           ...detections,
-          [data.camera_sid]: data
+          ...latestByCamera
         }).reduce((sum, det) => sum + (det.detections?.count || 0), 0);
 
         return {
           ...prevStats,
-          totalDetections: prevStats.totalDetections + (data.detections?.count || 0),
+          totalDetections: prevStats.totalDetections + newDetectionCount,
           activeThreats: currentActiveThreats
         };
       });
@@ -15,7 +15,7 @@
  * - Capture from webcam at 8-10 FPS
  * - Resize to 640x480 for performance
  * - Encode to JPEG with quality 60
- * - Convert to base64 and emit via Socket.IO
+ * - Emit raw JPEG bytes via Socket.IO (binary frame, no base64)
  */
 
 import { useState, useEffect, useRef } from 'react';
@@ -76,14 +76,13 @@ export default function CameraClient() {
       // Draw video frame to canvas (resized to 640x480)
       ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
 
-      // Convert to JPEG base64 (Quality 0.6 - good balance at 640x480)
-      const dataUrl = canvas.toDataURL('image/jpeg', 0.6);
-      const base64data = dataUrl.split(',')[1];
-
-      // Emit frame to server
-      socket.emit('camera_frame', {
-        frame: base64data
-      });
+      // Encode to JPEG (Quality 0.6 - good balance at 640x480) and emit raw bytes
+      canvas.toBlob((blob) => {
+        if (!blob) return;
+        blob.arrayBuffer().then((buffer) => {
+          socket.emit('camera_frame', buffer);
+        });
+      }, 'image/jpeg', 0.6);
       
       // Update stats
       frameCountRef.current++;